@@ -110,9 +110,10 @@ X, y = createDataPoints([[4,3], [2,-1], [-1,4]] , 1500, 0.5)
 
 epsilon = 0.3
 minimumSamples = 7
-db = DBSCAN(eps=epsilon, min_samples=minimumSamples).fit(X)
+db = DBSCAN(eps=epsilon, min_samples=minimumSamples, algorithm='ball_tree', n_jobs=-1).fit(X)
 labels = db.labels_
-np.unique(labels)
+uniq = np.unique(labels)
+uniq
 
 
 # <h2 id="distinguishing_outliers">Distinguishing Outliers</h2>
@@ -122,7 +123,8 @@ np.unique(labels)
 
 
 # First, create an array of booleans using the labels from db.
-core_samples_mask = np.zeros_like(db.labels_, dtype=bool)
+n = db.labels_.shape[0]
+core_samples_mask = np.zeros(n, dtype=np.bool_)
 core_samples_mask[db.core_sample_indices_] = True
 core_samples_mask
 
@@ -131,15 +133,15 @@ core_samples_mask
 
 
 # Number of clusters in labels, ignoring noise if present.
-n_clusters_ = len(set(labels)) - (1 if -1 in labels else 0)
+n_clusters_ = uniq.size - int(uniq[0] == -1)
 n_clusters_
 
 
 # In[6]:
 
 
-# Remove repetition in labels by turning it into a set.
-unique_labels = set(labels)
+# Remove repetition in labels.
+unique_labels = uniq
 unique_labels
 
 
@@ -156,21 +158,18 @@ colors
 # In[8]:
 
 
-# Plot the points with colors
-for k, col in zip(unique_labels, colors):
-    if k == -1:
-        # Black used for noise.
-        col = 'k'
+# Color of each point, cluster k gets colors[k].
+color_arr = colors[labels % len(colors)]
+# Black used for noise.
+color_arr[labels == -1] = (0, 0, 0, 1)
 
-    class_member_mask = (labels == k)
+# Plot the datapoints that are clustered
+xy = X[core_samples_mask]
+plt.scatter(xy[:, 0], xy[:, 1],s=50, c=color_arr[core_samples_mask], marker=u'o', alpha=0.5)
 
-    # Plot the datapoints that are clustered
-    xy = X[class_member_mask & core_samples_mask]
-    plt.scatter(xy[:, 0], xy[:, 1],s=50, c=col, marker=u'o', alpha=0.5)
-
-    # Plot the outliers
-    xy = X[class_member_mask & ~core_samples_mask]
-    plt.scatter(xy[:, 0], xy[:, 1],s=50, c=col, marker=u'o', alpha=0.5)
+# Plot the outliers
+xy = X[~core_samples_mask]
+plt.scatter(xy[:, 0], xy[:, 1],s=50, c=color_arr[~core_samples_mask], marker=u'o', alpha=0.5)
 
 
 # ## K-Means
@@ -378,8 +377,9 @@ import numpy as np
 
 filename='weather-stations20140101-20141231.csv'
 
-#Read csv
-pdf = pd.read_csv(filename)
+#Read csv, parsing only the columns used below
+pdf = pd.read_csv(filename, usecols=['Stn_Name','Lat','Long','Tm','Tx','Tn'],
+                  dtype={'Lat':np.float32,'Long':np.float32,'Tm':np.float32,'Tx':np.float32,'Tn':np.float32})
 pdf.head(5)
 
 
@@ -424,23 +424,26 @@ my_map = Basemap(projection='merc',
             llcrnrlon=llon, llcrnrlat=llat, #min longitude (llcrnrlon) and latitude (llcrnrlat)
             urcrnrlon=ulon, urcrnrlat=ulat) #max longitude (urcrnrlon) and latitude (urcrnrlat)
 
-my_map.drawcoastlines()
-my_map.drawcountries()
-# my_map.drawmapboundary()
-my_map.fillcontinents(color = 'white', alpha = 0.3)
-my_map.shadedrelief()
+# Draw the background of Basemap m on a new figure, reusing the coastlines it already loaded
+def draw_background(m):
+    plt.figure()
+    ax = plt.gca()
+    m.drawcoastlines(ax=ax)
+    m.drawcountries(ax=ax)
+    # m.drawmapboundary(ax=ax)
+    m.fillcontinents(color = 'white', alpha = 0.3, ax=ax)
+    m.shadedrelief(scale=0.2, ax=ax)
+
+draw_background(my_map)
 
 # To collect data based on stations        
 
-xs,ys = my_map(np.asarray(pdf.Long), np.asarray(pdf.Lat))
-pdf['xm']= xs.tolist()
-pdf['ym'] =ys.tolist()
+xs,ys = my_map(pdf['Long'].to_numpy(copy=False), pdf['Lat'].to_numpy(copy=False))
+pdf['xm'] = xs.astype(np.float32)
+pdf['ym'] = ys.astype(np.float32)
 
 #Visualization1
-for index,row in pdf.iterrows():
-#   x,y = my_map(row.Long, row.Lat)
-   my_map.plot(row.xm, row.ym,markerfacecolor =([1,0,0]),  marker='o', markersize= 5, alpha = 0.75)
-#plt.text(x,y,stn)
+my_map.scatter(pdf['xm'].to_numpy(), pdf['ym'].to_numpy(), s=25, facecolor='red', marker='o', alpha = 0.75)
 plt.show()
 
 
@@ -455,21 +458,56 @@ plt.show()
 
 from sklearn.cluster import DBSCAN
 import sklearn.utils
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import StandardScaler
+# Use the GPU implementation from RAPIDS cuML when it is installed and a CUDA device is present
+use_gpu = False
+try:
+    from cuml.cluster import DBSCAN as cuDBSCAN
+    import cupy as cp
+    use_gpu = cp.cuda.runtime.getDeviceCount() > 0
+except (ImportError, RuntimeError):
+    # cupy's CUDARuntimeError (no driver or no device) is a RuntimeError
+    pass
 sklearn.utils.check_random_state(1000)
-Clus_dataSet = pdf[['xm','ym']]
-Clus_dataSet = np.nan_to_num(Clus_dataSet)
-Clus_dataSet = StandardScaler().fit_transform(Clus_dataSet)
+Clus_dataSet = np.ascontiguousarray(pdf[['xm','ym']].to_numpy(dtype=np.float32, copy=False))
+# Fill NaNs and standardize in place, without extra n x d temporaries
+np.nan_to_num(Clus_dataSet, copy=False, nan=0.0)
+Clus_dataSet = StandardScaler(copy=False).fit_transform(Clus_dataSet)
+eps = 0.15
+
+# Merge stations with identical coordinates, weighting each unique point by its station count.
+# The unique points are kept in order of first appearance, so DBSCAN numbers the clusters and
+# assigns shared border points exactly as it would on the full station list.
+_, first, inverse, w = np.unique(Clus_dataSet, axis=0, return_index=True, return_inverse=True, return_counts=True)
+order = np.argsort(first)
+rank = np.empty_like(order)
+rank[order] = np.arange(order.size)
+reps = Clus_dataSet[first[order]]
+w = w[order]
+inverse = rank[inverse.ravel()]
 
 # Compute DBSCAN
-db = DBSCAN(eps=0.15, min_samples=10).fit(Clus_dataSet)
-core_samples_mask = np.zeros_like(db.labels_, dtype=bool)
+if use_gpu:
+    db = cuDBSCAN(eps=eps, min_samples=10, output_type='numpy').fit(cp.asarray(reps), sample_weight=cp.asarray(w))
+else:
+    # Precompute the sparse eps-neighborhood graph once, it can be reused for any smaller eps
+    # KDTree is faster than BallTree on 2-D data
+    nn = NearestNeighbors(radius=eps, algorithm='kd_tree', leaf_size=40, metric='euclidean', n_jobs=-1).fit(reps)
+    G = nn.radius_neighbors_graph(reps, mode='distance')
+    db = DBSCAN(eps=eps, min_samples=10, metric='precomputed').fit(G, sample_weight=w)
+
+# Map the unique point results back to the stations
+n_reps = db.labels_.shape[0]
+core_samples_mask = np.zeros(n_reps, dtype=np.bool_)
 core_samples_mask[db.core_sample_indices_] = True
-labels = db.labels_
+core_samples_mask = core_samples_mask[inverse]
+labels = db.labels_[inverse]
 pdf["Clus_Db"]=labels
 
-realClusterNum=len(set(labels)) - (1 if -1 in labels else 0)
-clusterNum = len(set(labels)) 
+uniq = np.unique(labels)
+clusterNum = uniq.size
+realClusterNum = clusterNum - int(uniq[0] == -1)
 
 
 # A sample of clusters
@@ -481,7 +519,7 @@ pdf[["Stn_Name","Tx","Tm","Clus_Db"]]
 # In[14]:
 
 
-set(labels)
+uniq
 
 
 # ### 6- Visualization of clusters based on location
@@ -492,38 +530,33 @@ set(labels)
 # In[15]:
 
 
-from mpl_toolkits.basemap import Basemap
 import matplotlib.pyplot as plt
 from pylab import rcParams
 get_ipython().run_line_magic('matplotlib', 'inline')
 rcParams['figure.figsize'] = (14,10)
 
-my_map = Basemap(projection='merc',
-            resolution = 'l', area_thresh = 1000.0,
-            llcrnrlon=llon, llcrnrlat=llat, #min longitude (llcrnrlon) and latitude (llcrnrlat)
-            urcrnrlon=ulon, urcrnrlat=ulat) #max longitude (urcrnrlon) and latitude (urcrnrlat)
-
-my_map.drawcoastlines()
-my_map.drawcountries()
-#my_map.drawmapboundary()
-my_map.fillcontinents(color = 'white', alpha = 0.3)
-my_map.shadedrelief()
+draw_background(my_map)
 
 # To create a color map
-colors = plt.get_cmap('jet')(np.linspace(0.0, 1.0, clusterNum))
+palette = plt.get_cmap('jet')(np.linspace(0.0, 1.0, clusterNum)).astype(np.float32)
+cluster_colors = {k: (0.4,0.4,0.4) if k == -1 else palette[int(k)] for k in uniq}
 
 
 
+# Partition the stations once, then take the centroid and average temperature of each cluster
+groups = pdf.groupby('Clus_Db')
+centroids = groups[['xm','ym','Tm']].mean()
+
 #Visualization1
-for clust_number in set(labels):
-    c=(([0.4,0.4,0.4]) if clust_number == -1 else colors[np.int(clust_number)])
-    clust_set = pdf[pdf.Clus_Db == clust_number]                    
-    my_map.scatter(clust_set.xm, clust_set.ym, color =c,  marker='o', s= 20, alpha = 0.85)
+# Clusters in ascending order, with noise drawn last on top of them
+for clust_number in np.roll(uniq, -int(uniq[0] == -1)):
+    c = cluster_colors[clust_number]
+    clust_set = groups.get_group(clust_number)
+    my_map.scatter(clust_set['xm'].values, clust_set['ym'].values, color =c,  marker='o', s= 20, alpha = 0.85)
     if clust_number != -1:
-        cenx=np.mean(clust_set.xm) 
-        ceny=np.mean(clust_set.ym) 
+        cenx, ceny, avgT = centroids.loc[clust_number]
         plt.text(cenx,ceny,str(clust_number), fontsize=25, color='red',)
-        print ("Cluster "+str(clust_number)+', Avg Temp: '+ str(np.mean(clust_set.Tm)))
+        print ("Cluster "+str(clust_number)+', Avg Temp: '+ str(avgT))
 
 
 # ### 7- Clustering of stations based on their location, mean, max, and min Temperature
@@ -536,21 +569,29 @@ for clust_number in set(labels):
 
 from sklearn.cluster import DBSCAN
 import sklearn.utils
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import StandardScaler
 sklearn.utils.check_random_state(1000)
-Clus_dataSet = pdf[['xm','ym','Tx','Tm','Tn']]
-Clus_dataSet = np.nan_to_num(Clus_dataSet)
-Clus_dataSet = StandardScaler().fit_transform(Clus_dataSet)
+Clus_dataSet = np.ascontiguousarray(pdf[['xm','ym','Tx','Tm','Tn']].to_numpy(dtype=np.float32, copy=False))
+# Fill NaNs and standardize in place, without extra n x d temporaries
+np.nan_to_num(Clus_dataSet, copy=False, nan=0.0)
+Clus_dataSet = StandardScaler(copy=False).fit_transform(Clus_dataSet)
+
+# Precompute the sparse eps-neighborhood graph, BallTree suits the 5-D data
+nn = NearestNeighbors(radius=0.3, algorithm='ball_tree', n_jobs=-1).fit(Clus_dataSet)
+G = nn.radius_neighbors_graph(Clus_dataSet, mode='distance')
 
 # Compute DBSCAN
-db = DBSCAN(eps=0.3, min_samples=10).fit(Clus_dataSet)
-core_samples_mask = np.zeros_like(db.labels_, dtype=bool)
+db = DBSCAN(eps=0.3, min_samples=10, metric='precomputed').fit(G)
+n = db.labels_.shape[0]
+core_samples_mask = np.zeros(n, dtype=np.bool_)
 core_samples_mask[db.core_sample_indices_] = True
 labels = db.labels_
 pdf["Clus_Db"]=labels
 
-realClusterNum=len(set(labels)) - (1 if -1 in labels else 0)
-clusterNum = len(set(labels)) 
+uniq = np.unique(labels)
+clusterNum = uniq.size
+realClusterNum = clusterNum - int(uniq[0] == -1)
 
 
 # A sample of clusters
@@ -564,38 +605,33 @@ pdf[["Stn_Name","Tx","Tm","Clus_Db"]].head(5)
 # In[17]:
 
 
-from mpl_toolkits.basemap import Basemap
 import matplotlib.pyplot as plt
 from pylab import rcParams
 get_ipython().run_line_magic('matplotlib', 'inline')
 rcParams['figure.figsize'] = (14,10)
 
-my_map = Basemap(projection='merc',
-            resolution = 'l', area_thresh = 1000.0,
-            llcrnrlon=llon, llcrnrlat=llat, #min longitude (llcrnrlon) and latitude (llcrnrlat)
-            urcrnrlon=ulon, urcrnrlat=ulat) #max longitude (urcrnrlon) and latitude (urcrnrlat)
-
-my_map.drawcoastlines()
-my_map.drawcountries()
-#my_map.drawmapboundary()
-my_map.fillcontinents(color = 'white', alpha = 0.3)
-my_map.shadedrelief()
+draw_background(my_map)
 
 # To create a color map
-colors = plt.get_cmap('jet')(np.linspace(0.0, 1.0, clusterNum))
+palette = plt.get_cmap('jet')(np.linspace(0.0, 1.0, clusterNum)).astype(np.float32)
+cluster_colors = {k: (0.4,0.4,0.4) if k == -1 else palette[int(k)] for k in uniq}
+
 
 
+# Partition the stations once, then take the centroid and average temperature of each cluster
+groups = pdf.groupby('Clus_Db')
+centroids = groups[['xm','ym','Tm']].mean()
 
 #Visualization1
-for clust_number in set(labels):
-    c=(([0.4,0.4,0.4]) if clust_number == -1 else colors[np.int(clust_number)])
-    clust_set = pdf[pdf.Clus_Db == clust_number]                    
-    my_map.scatter(clust_set.xm, clust_set.ym, color =c,  marker='o', s= 20, alpha = 0.85)
+# Clusters in ascending order, with noise drawn last on top of them
+for clust_number in np.roll(uniq, -int(uniq[0] == -1)):
+    c = cluster_colors[clust_number]
+    clust_set = groups.get_group(clust_number)
+    my_map.scatter(clust_set['xm'].values, clust_set['ym'].values, color =c,  marker='o', s= 20, alpha = 0.85)
     if clust_number != -1:
-        cenx=np.mean(clust_set.xm) 
-        ceny=np.mean(clust_set.ym) 
+        cenx, ceny, avgT = centroids.loc[clust_number]
         plt.text(cenx,ceny,str(clust_number), fontsize=25, color='red',)
-        print ("Cluster "+str(clust_number)+', Avg Temp: '+ str(np.mean(clust_set.Tm)))
+        print ("Cluster "+str(clust_number)+', Avg Temp: '+ str(avgT))
 
 
 # In[ ]: